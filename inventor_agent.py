@@ -1,9 +1,23 @@
+import argparse
+import asyncio
+import json
+import logging
 import os
-from pydantic import BaseModel, Field
-from typing import List
-from agno.agent import Agent
-from agno.models.ollama import Ollama
-from agno.tools import tool
+import re
+import sys
+import threading
+from collections import Counter
+from functools import lru_cache
+from types import MappingProxyType
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional, only speeds up KB dumps
+    orjson = None
+
+log = logging.getLogger(__name__)
 
 # Our "Knowledge Base" of solutions
 # This maps PROBLEM TYPES to a list of solutions
@@ -12,7 +26,7 @@ from agno.tools import tool
 # We are manually populating it based on the expert URS document.
 # It maps "problem_domains" (bottlenecks) to proposed solutions.
 
-SOLUTION_KNOWLEDGE_BASE = {
+_RAW_KB = {
     "weighing": [
         {
             "solution_name": "Automated Weighing Station (URS APL01)",
@@ -66,22 +80,161 @@ SOLUTION_KNOWLEDGE_BASE = {
     ]
 }
 
+# The KB is read-only: freeze its lists to tuples. The public
+# SOLUTION_KNOWLEDGE_BASE is a read-only view that concurrent tool calls can
+# share without copies or locks.
+for _solutions in _RAW_KB.values():
+    for _sol in _solutions:
+        for _key in ("key_requirements", "example_vendors"):
+            _sol[_key] = tuple(_sol[_key])
 
-import os
-from pydantic import BaseModel, Field
-from typing import List, Optional
-from agno.agent import Agent
-from agno.models.lmstudio import LMStudio  # Using your working setup
-from agno.tools import tool
+SOLUTION_KNOWLEDGE_BASE = MappingProxyType(
+    {domain: tuple(MappingProxyType(sol) for sol in sols) for domain, sols in _RAW_KB.items()}
+)
 
-# --- PHASE 1: THE KNOWLEDGE BASE (DATABASE) ---
-# This is our mock DB of expert knowledge for the hackathon.
-# It maps problems (e.g., 'sample_processing') to solutions.
+# --- PHASE 1b: THE SEARCH INDEX ---
+# Flatten the KB once into parallel columns (one row per solution, integer
+# row IDs) and build a keyword index over the domain keys, solution names and
+# key requirements, so a typo or near-synonym still returns ranked candidates
+# instead of "no solution".
 
+_CITE_RE = re.compile(r"\[cite:[^\]]*\]")
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_MIN_PREFIX = 3
+_TOP_K = 2
+# Filler words that would otherwise match unrelated solutions; tokens shorter
+# than _MIN_PREFIX ("to", "in", "e", "g", ...) are dropped as well.
+_STOPWORDS = frozenset({
+    "and", "the", "for", "from", "with", "via", "per", "etc", "into", "between",
+    "using", "based", "our", "their", "all", "any", "new",
+})
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lowercase `text`, drop citation markers and split it into interned content-word tokens."""
+    return [
+        sys.intern(t)
+        for t in _TOKEN_RE.findall(_CITE_RE.sub(" ", text.lower()))
+        if len(t) >= _MIN_PREFIX and t not in _STOPWORDS
+    ]
+
+
+_DOMAINS: List[str] = list(SOLUTION_KNOWLEDGE_BASE)
+_NAMES: List[str] = []
+_DESCRIPTIONS: List[str] = []
+_BUDGETS: List[str] = []
+_KEY_REQS: List[Tuple[str, ...]] = []
+_DOMAIN_OF: List[int] = []
+_DOMAIN_INDEX: Dict[str, List[int]] = {}
+
+for _domain_id, _domain in enumerate(_DOMAINS):
+    for _sol in SOLUTION_KNOWLEDGE_BASE[_domain]:
+        _DOMAIN_INDEX.setdefault(_domain, []).append(len(_NAMES))
+        _NAMES.append(_sol["solution_name"])
+        _DESCRIPTIONS.append(_sol["description"])
+        _BUDGETS.append(_sol["avg_budget"])
+        _KEY_REQS.append(_sol["key_requirements"])
+        _DOMAIN_OF.append(_domain_id)
+
+# One template for every solution block. The per-row fields are kept next to
+# it so a caller can re-render with substituted fields (e.g. highlighted
+# keywords); the KB itself is static, so each fragment is also rendered once.
+_SOLUTION_TEMPLATE = (
+    "### ✅ Recommended Solution: {name}\n"
+    "**What it does:** {desc}\n"
+    "**Estimated Budget:** {budget}\n"
+    "**Key Requirements (from URS):**\n"
+    "{reqs}"
+    "---\n"
+)
+_ROW_FIELDS: List[Dict[str, str]] = [
+    {"name": name, "desc": desc, "budget": budget, "reqs": "* " + "\n* ".join(reqs) + "\n" if reqs else ""}
+    for name, desc, budget, reqs in zip(_NAMES, _DESCRIPTIONS, _BUDGETS, _KEY_REQS)
+]
+_RENDERED: List[str] = [_SOLUTION_TEMPLATE.format_map(row) for row in _ROW_FIELDS]
+
+# The flattened KB in serializable form, e.g. for a debug dump or a listing endpoint
+_KB_FLAT = {
+    "domains": _DOMAINS,
+    "names": _NAMES,
+    "descriptions": _DESCRIPTIONS,
+    "budgets": _BUDGETS,
+    "key_reqs": _KEY_REQS,
+    "domain_of": _DOMAIN_OF,
+}
+
+
+def _dump_kb_json() -> bytes:
+    """Serialize the flattened KB to indented JSON, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(_KB_FLAT, option=orjson.OPT_INDENT_2)
+    return json.dumps(_KB_FLAT, indent=2, ensure_ascii=False).encode()
+
+
+_EXACT_TO_IDS: Dict[str, List[int]] = {}
+_PREFIX_TO_IDS: Dict[str, List[int]] = {}
+
+for _row_id, _name in enumerate(_NAMES):
+    _texts = [_DOMAINS[_DOMAIN_OF[_row_id]], _name, *_KEY_REQS[_row_id]]
+    for _token in (t for text in _texts for t in _tokenize(text)):
+        _EXACT_TO_IDS.setdefault(_token, []).append(_row_id)
+        for _i in range(_MIN_PREFIX, len(_token)):
+            _PREFIX_TO_IDS.setdefault(sys.intern(_token[:_i]), []).append(_row_id)
+
+
+# Common ways users phrase each bottleneck, mapped to its KB key once at import.
+# Keys are in canonical form (casefolded, separators as "_"), see _canonical_domain.
+_DOMAIN_ALIASES: Dict[str, str] = {
+    "weighing": "weighing",
+    "weigh": "weighing",
+    "weighting": "weighing",
+    "weight": "weighing",
+    "weighing_station": "weighing",
+    "compound_weighing": "weighing",
+    "powder_weighing": "weighing",
+    "sample_handling_logistics": "sample_handling_logistics",
+    "sample_handling": "sample_handling_logistics",
+    "sample_logistics": "sample_handling_logistics",
+    "logistics": "sample_handling_logistics",
+    "tube_handling": "sample_handling_logistics",
+    "liquid_handling": "sample_handling_logistics",
+}
+
+
+# Separators that count as whitespace before the words are joined with "_"
+_CANON_TABLE = str.maketrans({"-": " ", "_": " "})
+
+
+def _canonical_domain(problem_domain: str) -> str:
+    """Map a user-supplied problem domain to its KB key (or a normalized form of it)."""
+    # split() also strips and collapses runs, so "weighing  station" and
+    # "Weighing-Station" both become "weighing_station"
+    key = "_".join(problem_domain.casefold().translate(_CANON_TABLE).split())
+    return _DOMAIN_ALIASES.get(key, key)
+
+
+def _search_solutions(query: str, top_k: int = _TOP_K) -> List[int]:
+    """
+    Return the row IDs of the `top_k` solutions that best match `query`, best first.
+    A solution only counts as a match if it hits more than half of the query's
+    content words, so one shared word ("liquid" in "liquid_chromatography")
+    doesn't turn an unknown domain into a confident recommendation.
+    """
+    exact_hits: Counter = Counter()
+    prefix_hits: Counter = Counter()
+    matched_terms: Counter = Counter()
+    terms = set(_tokenize(query))
+    for token in terms:
+        exact_ids = _EXACT_TO_IDS.get(token, ())
+        prefix_ids = _PREFIX_TO_IDS.get(token, ())
+        exact_hits.update(exact_ids)
+        prefix_hits.update(prefix_ids)
+        matched_terms.update(set(exact_ids) | set(prefix_ids))
+
+    candidates = [i for i, n in matched_terms.items() if 2 * n > len(terms)]
+    ranked = sorted(candidates, key=lambda i: (-exact_hits[i], -prefix_hits[i], i))
+    return ranked[:top_k]
 
-# --- PHASE 2: DEFINE THE DATA STRUCTURES (Pydantic) ---
-# This is the "strukturierter URS-Output" (structured output)
-# the hackathon PDF mentions[cite: 14].
 
 # --- PHASE 2: DEFINE THE DATA STRUCTURES (Pydantic) ---
 # This is the "strukturierter URS-Output"
@@ -94,9 +247,11 @@ class LabRequirements(BaseModel):
     current_process: str = Field(..., description="A brief description of the current manual process, e.g., 'manually moving tubes between racks'.")
     budget: Optional[str] = Field(None, description="The user's estimated budget, e.g., 'under 100k'.")
 
+# Cached serializer for the debug dump, compiled once instead of per call
+_REQ_ADAPTER = TypeAdapter(LabRequirements)
+
 # --- PHASE 3: DEFINE THE AGENT'S "TOOLS" ---
 
-@tool
 def get_lab_requirements(
     problem_domain: str,
     samples_per_day: int,
@@ -107,83 +262,159 @@ def get_lab_requirements(
     Call this tool to store the user's structured lab requirements
     after you have collected all the necessary information.
     """
-    print("--- [TOOL CALLED: get_lab_requirements] ---")
-    reqs = LabRequirements(
-        problem_domain=problem_domain,
-        samples_per_day=samples_per_day,
-        current_process=current_process,
-        budget=budget
-    )
-    print(f"--- [DATA CAPTURED]: {reqs.model_dump_json(indent=2)} ---")
+    log.debug("TOOL CALLED: get_lab_requirements")
+    if log.isEnabledFor(logging.DEBUG):
+        # The model is only built for the debug dump. Arguments coming from the
+        # agent are validated by the tool(...) wrapper in create_lab_agent, so
+        # skip re-validation here; direct callers must pass the right types.
+        reqs = LabRequirements.model_construct(
+            problem_domain=problem_domain,
+            samples_per_day=samples_per_day,
+            current_process=current_process,
+            budget=budget
+        )
+        log.debug("DATA CAPTURED: %s", _REQ_ADAPTER.dump_json(reqs, indent=2).decode())
     
-    # This tool doesn't just store, it *triggers* the solution search
-    return find_automation_solution(reqs)
+    # This tool doesn't just store, it *triggers* the solution search.
+    # The raw scalars go straight to the cached renderer, skipping the model.
+    log.debug("Finding Automation Solution")
+    return _render_solution(
+        _canonical_domain(problem_domain),
+        samples_per_day,
+        current_process.strip(),
+    )
 
 
 def find_automation_solution(requirements: LabRequirements) -> str:
     """
     Internal function (not a tool) that searches the Knowledge Base.
     This is the "Lösungsgenerator" (solution generator).
+    The agent's tool calls `_render_solution` directly; this is the entry
+    point for callers that already hold a `LabRequirements` model.
     """
-    print("--- [Finding Automation Solution] ---")
-    domain = requirements.problem_domain.lower().strip().replace(" ", "_")
-    throughput = requirements.samples_per_day
+    log.debug("Finding Automation Solution")
+    # Canonicalize the domain so equivalent requests share one cache entry; the
+    # free-text process is only stripped because it is echoed back verbatim
+    return _render_solution(
+        _canonical_domain(requirements.problem_domain),
+        requirements.samples_per_day,
+        requirements.current_process.strip(),
+    )
 
-    if domain not in SOLUTION_KNOWLEDGE_BASE:
-        return f"I have understood your need for '{domain}', but I do not have a pre-built solution for that in my database."
 
-    # Find solutions that match the domain
-    possible_solutions = SOLUTION_KNOWLEDGE_BASE[domain]
+@lru_cache(maxsize=256)
+def _render_solution(domain: str, throughput: int, current_process: str) -> str:
+    """
+    Build the solution proposal for a canonical domain (memoized).
+    `current_process` is shown to the user as given; the
+    domain-dependent part is cached separately in `_solutions_block`.
+    """
+    solutions_block = _solutions_block(domain)
+    if solutions_block is None:
+        return f"I have understood your need for '{domain}', but I do not have a pre-built solution for that in my database."
 
     # --- Build the Summary Report ---
-    summary = "--- 🤖 AI Consultant: Solution Proposal --- \n\n"
-    summary += f"Based on your bottleneck with **{domain}** (processing **{throughput} samples/day** using a '{requirements.current_process}' process), I have identified the following automation solutions from my URS knowledge base:\n\n"
+    parts: List[str] = []
+    parts.append("--- 🤖 AI Consultant: Solution Proposal --- \n\n")
+    parts.append(f"Based on your bottleneck with **{domain}** (processing **{throughput} samples/day** using a '{current_process}' process), I have identified the following automation solutions from my URS knowledge base:\n\n")
 
-    for sol in possible_solutions:
-        summary += f"### ✅ Recommended Solution: {sol['solution_name']}\n"
-        summary += f"**What it does:** {sol['description']}\n"
-        summary += f"**Estimated Budget:** {sol['avg_budget']}\n"
-        
-        # Add the Key Requirements from the URS
-        summary += "**Key Requirements (from URS):**\n"
-        for req in sol['key_requirements']:
-            summary += f"* {req}\n"
-        summary += "---\n"
+    parts.append(solutions_block)
+
+    parts.append("\nThis proposal is a starting point. We can now dive deeper into specific products.")
+    return "".join(parts)
+
+
+@lru_cache(maxsize=64)
+def _solutions_block(domain: str) -> Optional[str]:
+    """Return the rendered solutions for a canonical domain, or None if nothing matches."""
+    # A known domain is a direct hit; anything else falls back to the ranked search
+    row_ids = _DOMAIN_INDEX.get(domain) or _search_solutions(domain)
+    if not row_ids:
+        return None
+    # Each solution block (incl. its URS key requirements) is pre-rendered at import
+    return "".join(_RENDERED[i] for i in row_ids)
 
-    summary += "\nThis proposal is a starting point. We can now dive deeper into specific products."
-    return summary
 
 # --- PHASE 4: CREATE THE AGENT ---
 
+# These instructions are CRITICAL for the hackathon.
+_LAB_INSTRUCTIONS: Tuple[str, ...] = (
+    "You are an 'AI Lab Consultant' for the 'Lab of the Future'[cite: 7].",
+    "Your goal is to understand a lab manager's needs, just like an experienced consultant[cite: 10].",
+    "Your PRIMARY TASK is to fill out the `LabRequirements` form by asking the user questions.",
+    "Start by asking them what their main automation challenge is.",
+    "You MUST find out: 1. `problem_domain`, 2. `samples_per_day`, 3. `current_process`.",
+    "Be conversational! If they say 'We need to automate 500 samples', ask 'Great, what kind of samples are they? And what is the current manual process?'",
+    "Once you have all the required information (problem_domain, samples_per_day, current_process), you MUST call the `get_lab_requirements` tool with the data you collected.",
+    "Do not call the tool before you have all three required pieces of information.",
+    "After the tool is called, present the final summary it gives you.",
+)
+
 def create_lab_agent():
-    
-    # These instructions are CRITICAL for the hackathon.
-    agent_instructions = [
-        "You are an 'AI Lab Consultant' for the 'Lab of the Future'[cite: 7].",
-        "Your goal is to understand a lab manager's needs, just like an experienced consultant[cite: 10].",
-        "Your PRIMARY TASK is to fill out the `LabRequirements` form by asking the user questions.",
-        "Start by asking them what their main automation challenge is.",
-        "You MUST find out: 1. `problem_domain`, 2. `samples_per_day`, 3. `current_process`.",
-        "Be conversational! If they say 'We need to automate 500 samples', ask 'Great, what kind of samples are they? And what is the current manual process?'",
-        "Once you have all the required information (problem_domain, samples_per_day, current_process), you MUST call the `get_lab_requirements` tool with the data you collected.",
-        "Do not call the tool before you have all three required pieces of information.",
-        "After the tool is called, present the final summary it gives you."
-    ]
-    
+    # agno is only needed to run the agent, so KB-only callers don't pay for importing it
+    from agno.agent import Agent
+    from agno.models.lmstudio import LMStudio
+    from agno.tools import tool
+
     # Use the working LMStudio setup
     MY_LMSTUDIO_MODEL_ID = "llama3:8" 
 
     lab_agent = Agent(
         model=LMStudio(id=MY_LMSTUDIO_MODEL_ID), 
-        tools=[get_lab_requirements],
-        instructions=agent_instructions,
+        tools=[tool(get_lab_requirements)],
+        instructions=list(_LAB_INSTRUCTIONS),
         markdown=True,
     )
     return lab_agent
 
 # --- PHASE 5: RUN THE PROTOTYPE (Testable Chatbot) ---
 
-def main():
+def _stream_response(agent, message: str, stop: threading.Event) -> None:
+    """Print the agent's reply as it streams in, until it ends or `stop` is set."""
+    from agno.run.agent import RunEvent
+
+    for chunk in agent.run(message, stream=True):
+        if stop.is_set():
+            break
+        # Only content deltas; lifecycle events like RunCompleted repeat the full reply
+        if chunk.event == RunEvent.run_content and isinstance(chunk.content, str):
+            sys.stdout.write(chunk.content)
+            sys.stdout.flush()
+    sys.stdout.write("\n")
+
+
+async def _in_daemon_thread(func, *args):
+    """
+    Run `func(*args)` in a daemon thread and await its result. Unlike
+    asyncio.to_thread, a cancelled await doesn't make asyncio.run (or the
+    interpreter) wait for the thread to finish on shutdown.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(result, exc):
+        if not future.done():
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    def target():
+        try:
+            outcome = (func(*args), None)
+        except BaseException as exc:
+            outcome = (None, exc)
+        try:
+            loop.call_soon_threadsafe(settle, *outcome)
+        except RuntimeError:
+            pass  # the loop was closed after Ctrl-C; nobody awaits the result
+
+    threading.Thread(target=target, daemon=True).start()
+    return await future
+
+async def main():
+    from prompt_toolkit import PromptSession
+
     agent = create_lab_agent()
     if agent is None:
         return
@@ -192,21 +423,40 @@ def main():
     print("--- (Using LMStudio Model: llama3:8) ---")
     print("Type 'quit' to exit.\n")
     
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("KNOWLEDGE BASE: %s", _dump_kb_json().decode())
+
+    session = PromptSession()
+    stop = threading.Event()
+
     try:
         # Start the conversation
-        agent.print_response("Hi, I'm your AI Lab Consultant. What automation problem can I help you solve today?")
+        await _in_daemon_thread(_stream_response, agent, "Hi, I'm your AI Lab Consultant. What automation problem can I help you solve today?", stop)
         
         while True:
-            user_input = input("You: ")
+            user_input = await session.prompt_async("You: ")
             if user_input.lower() == "quit":
                 print("Agent: Goodbye!")
                 break
             
-            # This runs the agent's "brain"
-            agent.print_response(user_input)
+            # This runs the agent's "brain" off the event loop
+            await _in_daemon_thread(_stream_response, agent, user_input, stop)
             
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, EOFError, asyncio.CancelledError):
+        # Under asyncio.run, Ctrl-C during a reply cancels this task instead of
+        # raising KeyboardInterrupt; tell the streaming thread to stop either way
+        stop.set()
         print("\nGoodbye!")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="AI Lab Consultant prototype")
+    parser.add_argument("--verbose", action="store_true", help="log tool calls, captured data and the KB")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    if args.verbose:
+        log.setLevel(logging.DEBUG)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nGoodbye!")
@@ -1,9 +1,13 @@
+import argparse
+import asyncio
+import logging
 import os
-from pydantic import BaseModel, Field
-from typing import List, Optional
-from agno.agent import Agent
-from agno.models.lmstudio import LMStudio # Or any other model
-from agno.tools import tool
+import sys
+import threading
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import List, Optional, Tuple
+
+log = logging.getLogger(__name__)
 
 # --- PHASE 1: DEFINE THE DATA STRUCTURES (Pydantic) ---
 # This is the "strukturierter URS-Output" (structured output) 
@@ -31,11 +35,17 @@ class WeighingStationURS(BaseModel):
     
     workflow_use_cases: List[str] = Field(..., description="The types of weighing workflows needed. e.g., ['one-to-many', 'many-to-one'].")
 
+# Cached serializer for the debug dump, compiled once instead of per call
+_URS_ADAPTER = TypeAdapter(WeighingStationURS)
+
+def _bullets(items: List[str]) -> str:
+    """Render `items` as markdown bullet lines in a single join."""
+    return "* " + "\n* ".join(items) + "\n" if items else ""
+
 # --- PHASE 2: DEFINE THE AGENT'S "TOOLS" ---
 # This tool is the *final step* of the Requirements Engineering process.
 # It takes all the gathered information and generates the formal URS output.
 
-@tool
 def generate_weighing_station_urs(
     project_scope: str,
     throughput: str,
@@ -52,8 +62,10 @@ def generate_weighing_station_urs(
     the final structured URS document.
     """
     
-    # Create the structured data object
-    urs_data = WeighingStationURS(
+    # Create the structured data object. Arguments coming from the agent are
+    # validated by the tool(...) wrapper in create_requirements_agent, so skip
+    # re-validation here; direct callers must pass the right types.
+    urs_data = WeighingStationURS.model_construct(
         project_scope=project_scope,
         throughput=throughput,
         weighing_specs=weighing_specs,
@@ -64,84 +76,132 @@ def generate_weighing_station_urs(
         workflow_use_cases=workflow_use_cases
     )
     
-    print("--- [TOOL CALLED: generate_weighing_station_urs] ---")
-    print(f"--- [DATA CAPTURED]: {urs_data.model_dump_json(indent=2)} ---")
+    log.debug("TOOL CALLED: generate_weighing_station_urs")
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("DATA CAPTURED: %s", _URS_ADAPTER.dump_json(urs_data, indent=2).decode())
 
     # --- Build the Final URS Report ---
     # This string *is* the "strukturierter URS-Output"
     
-    report = "--- 📋 AI Consultant: Generated URS Document (APL01-Draft) --- \n\n"
-    report += "Thank you. Based on our interview, I have drafted the following User Requirements Specification (URS) for the new **Automated Weighing Station**.\n\n"
+    parts: List[str] = []
+    parts.append("--- 📋 AI Consultant: Generated URS Document (APL01-Draft) --- \n\n")
+    parts.append("Thank you. Based on our interview, I have drafted the following User Requirements Specification (URS) for the new **Automated Weighing Station**.\n\n")
     
-    report += f"### 1. Project Scope\n"
-    report += f"* {urs_data.project_scope}\n\n"
+    parts.append(f"### 1. Project Scope\n")
+    parts.append(f"* {urs_data.project_scope}\n\n")
     
-    report += f"### 2. Throughput\n"
-    report += f"* {urs_data.throughput} [cite: 562]\n\n"
+    parts.append(f"### 2. Throughput\n")
+    parts.append(f"* {urs_data.throughput} [cite: 562]\n\n")
     
-    report += f"### 3. Weighing Specifications\n"
-    report += f"* **Range & Precision:** {urs_data.weighing_specs} [cite: 554]\n\n"
+    parts.append(f"### 3. Weighing Specifications\n")
+    parts.append(f"* **Range & Precision:** {urs_data.weighing_specs} [cite: 554]\n\n")
     
-    report += f"### 4. Categories of Chemicals\n"
-    report += "The system must handle: [cite: 556]\n"
-    for item in urs_data.chemical_types:
-        report += f"* {item}\n"
-    report += "\n"
+    parts.append(f"### 4. Categories of Chemicals\n")
+    parts.append("The system must handle: [cite: 556]\n")
+    parts.append(_bullets(urs_data.chemical_types))
+    parts.append("\n")
     
-    report += f"### 5. Labware\n"
-    report += "The system must handle: [cite: 558]\n"
-    for item in urs_data.labware_containers:
-        report += f"* {item}\n"
-    report += "\n"
+    parts.append(f"### 5. Labware\n")
+    parts.append("The system must handle: [cite: 558]\n")
+    parts.append(_bullets(urs_data.labware_containers))
+    parts.append("\n")
     
-    report += f"### 6. Identification & Labeling\n"
-    report += f"* {urs_data.identification_labeling} [cite: 560]\n\n"
+    parts.append(f"### 6. Identification & Labeling\n")
+    parts.append(f"* {urs_data.identification_labeling} [cite: 560]\n\n")
     
-    report += f"### 7. Input/Output Data\n"
-    report += f"* {urs_data.data_handling} [cite: 566]\n\n"
+    parts.append(f"### 7. Input/Output Data\n")
+    parts.append(f"* {urs_data.data_handling} [cite: 566]\n\n")
     
-    report += f"### 8. Workflows / Use Cases\n"
-    report += "The system must support: [cite: 568]\n"
-    for item in urs_data.workflow_use_cases:
-        report += f"* {item}\n"
-    report += "\n---\n"
-    report += "This draft can now be used for the 'Solution Finding' phase."
+    parts.append(f"### 8. Workflows / Use Cases\n")
+    parts.append("The system must support: [cite: 568]\n")
+    parts.append(_bullets(urs_data.workflow_use_cases))
+    parts.append("\n---\n")
+    parts.append("This draft can now be used for the 'Solution Finding' phase.")
     
-    return report
+    return "".join(parts)
 
 # --- PHASE 3: CREATE THE AGENT ---
 
+# These instructions guide the agent to *ask questions* to fill the URS
+_REQ_INSTRUCTIONS: Tuple[str, ...] = (
+    "You are an 'AI Requirements Engineer' for the 'Lab of the Future'[cite: 7].",
+    "Your goal is to conduct a 'Customer Interview' to 'Understand Needs' (Bedarf verstehen)[cite: 10].",
+    "Your FINAL OUTPUT will be a 'strukturierter URS-Output' (structured URS output).",
+    "Your task right now is to interview a lab manager to create a URS for a new **Automated Weighing Station**.",
+    "You MUST ask questions to gather all the information needed for the `WeighingStationURS` model.",
+    "Ask questions conversationally, one or two at a time. Do not overwhelm the user.",
+    "Start by asking about the main goal (project_scope) and the number of samples (throughput).",
+    "Then, ask about the technical details: weighing range, chemicals, labware, barcodes, and data formats.",
+    "Refer to the 'URS APL01' document  as your mental guide for what questions to ask.",
+    "Once you have ALL the information (project_scope, throughput, weighing_specs, chemical_types, labware_containers, identification_labeling, data_handling, workflow_use_cases), you MUST call the `generate_weighing_station_urs` tool.",
+    "Do not call the tool until you have all 8 pieces of information.",
+)
+
 def create_requirements_agent():
-    
-    # These instructions guide the agent to *ask questions* to fill the URS
-    agent_instructions = [
-        "You are an 'AI Requirements Engineer' for the 'Lab of the Future'[cite: 7].",
-        "Your goal is to conduct a 'Customer Interview' to 'Understand Needs' (Bedarf verstehen)[cite: 10].",
-        "Your FINAL OUTPUT will be a 'strukturierter URS-Output' (structured URS output).",
-        "Your task right now is to interview a lab manager to create a URS for a new **Automated Weighing Station**.",
-        "You MUST ask questions to gather all the information needed for the `WeighingStationURS` model.",
-        "Ask questions conversationally, one or two at a time. Do not overwhelm the user.",
-        "Start by asking about the main goal (project_scope) and the number of samples (throughput).",
-        "Then, ask about the technical details: weighing range, chemicals, labware, barcodes, and data formats.",
-        "Refer to the 'URS APL01' document  as your mental guide for what questions to ask.",
-        "Once you have ALL the information (project_scope, throughput, weighing_specs, chemical_types, labware_containers, identification_labeling, data_handling, workflow_use_cases), you MUST call the `generate_weighing_station_urs` tool.",
-        "Do not call the tool until you have all 8 pieces of information."
-    ]
-    
+    # agno is only needed to run the agent, so importing this module stays cheap
+    from agno.agent import Agent
+    from agno.models.lmstudio import LMStudio # Or any other model
+    from agno.tools import tool
+
     # Use your working LMStudio (or other) model
     MY_LMSTUDIO_MODEL_ID = "llama3:8" 
 
     req_agent = Agent(
         model=LMStudio(id=MY_LMSTUDIO_MODEL_ID), 
-        tools=[generate_weighing_station_urs],
-        instructions=agent_instructions,
+        tools=[tool(generate_weighing_station_urs)],
+        instructions=list(_REQ_INSTRUCTIONS),
         markdown=True,
     )
     return req_agent
 
 # --- PHASE 4: RUN THE PROTOTYPE (Testable Chatbot) ---
 
-def main():
+def _stream_response(agent, message: str, stop: threading.Event) -> None:
+    """Print the agent's reply as it streams in, until it ends or `stop` is set."""
+    from agno.run.agent import RunEvent
+
+    for chunk in agent.run(message, stream=True):
+        if stop.is_set():
+            break
+        # Only content deltas; lifecycle events like RunCompleted repeat the full reply
+        if chunk.event == RunEvent.run_content and isinstance(chunk.content, str):
+            sys.stdout.write(chunk.content)
+            sys.stdout.flush()
+    sys.stdout.write("\n")
+
+
+async def _in_daemon_thread(func, *args):
+    """
+    Run `func(*args)` in a daemon thread and await its result. Unlike
+    asyncio.to_thread, a cancelled await doesn't make asyncio.run (or the
+    interpreter) wait for the thread to finish on shutdown.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(result, exc):
+        if not future.done():
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    def target():
+        try:
+            outcome = (func(*args), None)
+        except BaseException as exc:
+            outcome = (None, exc)
+        try:
+            loop.call_soon_threadsafe(settle, *outcome)
+        except RuntimeError:
+            pass  # the loop was closed after Ctrl-C; nobody awaits the result
+
+    threading.Thread(target=target, daemon=True).start()
+    return await future
+
+async def main():
+    from prompt_toolkit import PromptSession
+
     agent = create_requirements_agent()
     if agent is None:
         return
@@ -150,21 +210,37 @@ def main():
     print("--- (This agent will interview you to create a URS) ---")
     print("Type 'quit' to exit.\n")
     
+    session = PromptSession()
+    stop = threading.Event()
+
     try:
         # Start the interview
-        agent.print_response("Hi, I'm your AI Requirements Engineer. I'm here to help you draft a User Requirements Specification (URS) for a new automated weighing station.  \n\nTo start, could you briefly describe the main goal of this new station?")
+        await _in_daemon_thread(_stream_response, agent, "Hi, I'm your AI Requirements Engineer. I'm here to help you draft a User Requirements Specification (URS) for a new automated weighing station.  \n\nTo start, could you briefly describe the main goal of this new station?", stop)
         
         while True:
-            user_input = input("You: ")
+            user_input = await session.prompt_async("You: ")
             if user_input.lower() == "quit":
                 print("Agent: Goodbye!")
                 break
             
-            # This runs the agent's "brain"
-            agent.print_response(user_input)
+            # This runs the agent's "brain" off the event loop
+            await _in_daemon_thread(_stream_response, agent, user_input, stop)
             
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, EOFError, asyncio.CancelledError):
+        # Under asyncio.run, Ctrl-C during a reply cancels this task instead of
+        # raising KeyboardInterrupt; tell the streaming thread to stop either way
+        stop.set()
         print("\nGoodbye!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="AI Requirements Engineer prototype")
+    parser.add_argument("--verbose", action="store_true", help="log tool calls and captured data")
+    args = parser.parse_args()
+
+    logging.basicConfig()
+    if args.verbose:
+        log.setLevel(logging.DEBUG)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nGoodbye!")
\ No newline at end of file
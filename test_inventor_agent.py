@@ -0,0 +1,49 @@
+import pytest
+
+import inventor_agent as ia
+
+
+@pytest.mark.parametrize("domain", [
+    "data_analysis_and_reporting",
+    "hplc_to_lims",
+    "pcr_in_plates",
+    "liquid_chromatography",
+    "data_analysis",
+])
+def test_unknown_domain_has_no_solution(domain):
+    assert ia._search_solutions(domain) == []
+    assert "do not have a pre-built solution" in ia._render_solution(domain, 100, "manual")
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("weighing", "Automated Weighing Station (URS APL01)"),
+    ("logistics_robot", "Logistics Robot 1: Tube Handling & Weighing (URS APL07)"),
+    ("tube weighing", "Logistics Robot 1: Tube Handling & Weighing (URS APL07)"),
+])
+def test_search_ranks_matching_solution_first(query, expected):
+    ids = ia._search_solutions(query)
+    assert ids and ia._NAMES[ids[0]] == expected
+
+
+def test_tokenize_drops_stopwords_and_short_tokens():
+    assert ia._tokenize("Pick & place tubes (e.g., rack80 to racks) [cite: 924]") == [
+        "pick", "place", "tubes", "rack80", "racks",
+    ]
+
+
+def test_render_keeps_process_text():
+    report = ia.get_lab_requirements("Weighing", 120, " Manual HPLC prep with Genevac racks ", "under 100k")
+    assert "'Manual HPLC prep with Genevac racks' process" in report
+    assert "**120 samples/day**" in report
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Weighing", "weighing"),
+    ("weighing-station", "weighing"),
+    ("  Weighing   Station ", "weighing"),
+    ("sample-handling", "sample_handling_logistics"),
+    ("Sample_Handling", "sample_handling_logistics"),
+    ("data - analysis", "data_analysis"),
+])
+def test_canonical_domain(raw, expected):
+    assert ia._canonical_domain(raw) == expected